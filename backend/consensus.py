@@ -1,7 +1,9 @@
 import asyncio
-import json
+import hashlib
 import logging
 import time
+from collections import deque
+from functools import lru_cache
 from typing import Dict, List, Optional, Set
 from dataclasses import dataclass
 from enum import Enum
@@ -18,6 +20,21 @@ import aiohttp
 import websockets
 from websockets.server import WebSocketServerProtocol
 
+from .jsonutil import dumps_bytes, loads
+
+# Upper bound on remembered prepared/committed digests; oldest entries are
+# evicted so long-running nodes don't accumulate history forever
+MAX_TRACKED_DIGESTS = 4096
+
+
+def _now_ms() -> int:
+    """Wall-clock milliseconds without the float round-trip.
+
+    Timestamps travel inside consensus messages, so this stays on
+    CLOCK_REALTIME rather than a per-process monotonic clock.
+    """
+    return time.time_ns() // 1_000_000
+
 
 class Phase(Enum):
     PRE_PREPARE = "pre_prepare"
@@ -25,7 +42,23 @@ class Phase(Enum):
     COMMIT = "commit"
 
 
-@dataclass
+# Plain dict lookup; Phase(value) goes through EnumType.__call__ on every
+# decoded message
+_PHASE = Phase._value2member_map_
+
+
+@lru_cache(maxsize=8192)
+def _signed_payload(phase_value: str, digest: str, view: int) -> bytes:
+    """Byte string a phase signature covers.
+
+    Every vote on a digest signs the identical payload, so the 2f+1
+    verifications (and our own signing) share one cached buffer instead
+    of re-running the f-string format and encode per message.
+    """
+    return f"{phase_value}:{digest}:{view}".encode()
+
+
+@dataclass(slots=True, frozen=True)
 class Message:
     phase: Phase
     digest: str
@@ -33,18 +66,48 @@ class Message:
     signature: str
     timestamp: int
     view: int = 0
+    public_key: str = ""
+
+    def to_dict(self) -> dict:
+        return {
+            "phase": self.phase.value,
+            "digest": self.digest,
+            "node_id": self.node_id,
+            "signature": self.signature,
+            "timestamp": self.timestamp,
+            "view": self.view
+        }
+
+    def signed_bytes(self) -> bytes:
+        """The byte string this message's signature covers"""
+        return _signed_payload(self.phase.value, self.digest, self.view)
 
 
 class BLSManager:
     """Handles BLS signature operations"""
 
     def __init__(self, private_key_seed: bytes):
+        # Peer public keys are static, so cache the deserialized points;
+        # G1Element.from_bytes runs a subgroup check that would otherwise
+        # be paid on every verified message
+        self._pk_cache: Dict[str, "G1Element"] = {}
         if HAS_BLS:
             self.private_key = PrivateKey.from_seed(private_key_seed)
             self.public_key = self.private_key.get_g1()
         else:
             self.private_key = private_key_seed.hex()
             self.public_key = f"mock_pk_{private_key_seed.hex()[:16]}"
+            # Pre-absorbed key prefix: mock signing copies this mid-state
+            # instead of rehashing the key bytes on every message
+            self._mock_tmpl = hashlib.sha256(self.private_key.encode())
+
+    def _pk(self, public_key: str) -> "G1Element":
+        """Deserialize a public key hex string, memoized per peer"""
+        pk = self._pk_cache.get(public_key)
+        if pk is None:
+            pk = G1Element.from_bytes(bytes.fromhex(public_key))
+            self._pk_cache[public_key] = pk
+        return pk
 
     def sign(self, message: bytes) -> str:
         """Sign message with private key"""
@@ -52,23 +115,44 @@ class BLSManager:
             signature = AugSchemeMPL.sign(self.private_key, message)
             return bytes(signature).hex()
         else:
-            import hashlib
-            return hashlib.sha256(self.private_key.encode() + message).hexdigest()
+            h = self._mock_tmpl.copy()
+            h.update(message)
+            return h.hexdigest()
 
     def verify(self, public_key: str, message: bytes, signature: str) -> bool:
         """Verify signature"""
         if HAS_BLS:
             try:
-                pk = G1Element.from_bytes(bytes.fromhex(public_key))
+                pk = self._pk(public_key)
                 sig = G2Element.from_bytes(bytes.fromhex(signature))
                 return AugSchemeMPL.verify(pk, message, sig)
             except Exception:
                 return False
         else:
-            import hashlib
             expected = hashlib.sha256(public_key.encode() + message).hexdigest()
             return signature == expected
 
+    def batch_verify(self, public_keys: List[str], messages: List[bytes],
+                     signatures: List[str]) -> bool:
+        """Verify a batch of signatures with one aggregate pairing check.
+
+        One aggregate_verify costs roughly one pairing regardless of batch
+        size, versus one pairing per signature verified individually. A
+        False result says only that at least one signature is bad; callers
+        fall back to per-signature verification to find which.
+        """
+        if HAS_BLS:
+            try:
+                pks = [self._pk(pk) for pk in public_keys]
+                agg = AugSchemeMPL.aggregate(
+                    [G2Element.from_bytes(bytes.fromhex(sig)) for sig in signatures])
+                return AugSchemeMPL.aggregate_verify(pks, messages, agg)
+            except Exception:
+                return False
+        else:
+            return all(self.verify(pk, msg, sig)
+                       for pk, msg, sig in zip(public_keys, messages, signatures))
+
     def aggregate(self, signatures: List[str]) -> str:
         """Aggregate multiple signatures"""
         if HAS_BLS:
@@ -95,12 +179,31 @@ class PBFTNode:
 
         self.view = 0
         self.sequence_number = 0
+        # Primary status only changes on a view change, so it is cached
+        # here and refreshed by set_view instead of recomputed per message
+        self.is_primary = (self.view % total_nodes) == node_id
         self.current_digest = None
 
         self.prepare_messages: Dict[str, List[Message]] = {}
         self.commit_messages: Dict[str, List[Message]] = {}
+        # One vote per node per digest: replayed or duplicated messages
+        # are dropped here before they cost a verify or count toward the
+        # quorum twice
+        self._prepare_voters: Dict[str, Set[int]] = {}
+        self._commit_voters: Dict[str, Set[int]] = {}
         self.prepared_digests: Set[str] = set()
         self.committed_digests: Set[str] = set()
+        # Running COMMIT-signature aggregate per digest, folded as each
+        # vote arrives so commit time pays no O(votes) aggregation
+        self._commit_aggregates: Dict[str, str] = {}
+        self._prepared_order: deque = deque()
+        self._committed_order: deque = deque()
+        # First-seen order of in-flight digests: a round that never
+        # reaches quorum is evicted together with all its per-digest
+        # state once the bound is hit, so garbage digests cannot grow
+        # the vote maps without limit
+        self._round_seen: Set[str] = set()
+        self._round_order: deque = deque()
 
         self.connections: Dict[int, websockets.WebSocketServerProtocol] = {}
         self.server = None
@@ -108,22 +211,54 @@ class PBFTNode:
 
         self.logger = logging.getLogger(f"PBFTNode-{node_id}")
 
+        # Phase signatures are deterministic per (phase, digest, view), so
+        # duplicate messages and replays reuse the cached signature instead
+        # of paying another BLS sign
+        self._sign_phase = lru_cache(maxsize=4096)(self._sign_phase)
+
         # FIXED: Single node operation support
         self.single_node_mode = (total_nodes == 1 or len(peers) == 0)
         if self.single_node_mode:
             self.logger.info("🔧 Operating in single-node mode (consensus will be immediate)")
 
-    @property
-    def is_primary(self) -> bool:
-        """Check if this node is the primary for current view"""
-        return (self.view % self.total_nodes) == self.node_id
-
-    @property
-    def required_votes(self) -> int:
-        """Number of votes required for consensus (2f + 1)"""
+        # Quorum size (2f + 1) is fixed for the node's lifetime; a plain
+        # attribute skips the property descriptor call on every vote
         if self.single_node_mode:
-            return 1  # FIXED: Single node only needs itself
-        return (2 * ((self.total_nodes - 1) // 3)) + 1
+            self.required_votes = 1  # FIXED: Single node only needs itself
+        else:
+            self.required_votes = (2 * ((total_nodes - 1) // 3)) + 1
+
+    def _sign_phase(self, phase: str, digest: str, view: int) -> str:
+        """Sign a phase message; wrapped with an LRU cache per instance"""
+        return self.bls.sign(_signed_payload(phase, digest, view))
+
+    @staticmethod
+    def _track_digest(seen: Set[str], order: deque, digest: str):
+        """Record a digest, evicting the oldest once the bound is hit"""
+        seen.add(digest)
+        order.append(digest)
+        while len(order) > MAX_TRACKED_DIGESTS:
+            seen.discard(order.popleft())
+
+    def _note_round(self, digest: str):
+        """Track an in-flight digest, evicting the stalest round's state"""
+        if digest in self._round_seen:
+            return
+        self._round_seen.add(digest)
+        self._round_order.append(digest)
+        while len(self._round_order) > MAX_TRACKED_DIGESTS:
+            old = self._round_order.popleft()
+            self._round_seen.discard(old)
+            self.prepare_messages.pop(old, None)
+            self.commit_messages.pop(old, None)
+            self._prepare_voters.pop(old, None)
+            self._commit_voters.pop(old, None)
+            self._commit_aggregates.pop(old, None)
+
+    def set_view(self, view: int):
+        """Move to a new view, refreshing the cached primary flag"""
+        self.view = view
+        self.is_primary = (view % self.total_nodes) == self.node_id
 
     async def start_server(self):
         """Start WebSocket server for peer connections"""
@@ -134,7 +269,7 @@ class PBFTNode:
         async def handle_connection(websocket: WebSocketServerProtocol):
             try:
                 async for message in websocket:
-                    await self.handle_message(json.loads(message))
+                    await self.handle_message(loads(message))
             except websockets.exceptions.ConnectionClosed:
                 pass
             except Exception as e:
@@ -160,52 +295,66 @@ class PBFTNode:
                 except Exception as e:
                     self.logger.error(f"Failed to connect to peer {i}: {e}")
 
+    async def _local_deliver(self, message: Message):
+        """Dispatch a locally produced message straight to its phase handler.
+
+        Single-node mode previously simulated the network by serializing
+        the message into a dict and feeding it back through
+        handle_message; delivering the already-built Message skips the
+        dict/enum round trip entirely.
+        """
+        if message.phase == Phase.PRE_PREPARE:
+            await self.handle_pre_prepare(message)
+        elif message.phase == Phase.PREPARE:
+            await self.handle_prepare(message)
+        elif message.phase == Phase.COMMIT:
+            await self.handle_commit(message)
+
     async def broadcast_message(self, message: Message):
         """Broadcast message to all connected peers"""
         if self.single_node_mode:
             # FIXED: In single node mode, simulate immediate consensus
-            await self.handle_message({
-                "phase": message.phase.value,
-                "digest": message.digest,
-                "node_id": message.node_id,
-                "signature": message.signature,
-                "timestamp": message.timestamp,
-                "view": message.view,
-                "public_key": self.bls.public_key
-            })
+            await self._local_deliver(message)
             return
 
-        message_json = json.dumps({
-            "phase": message.phase.value,
-            "digest": message.digest,
-            "node_id": message.node_id,
-            "signature": message.signature,
-            "timestamp": message.timestamp,
-            "view": message.view
-        })
+        # Binary frame: orjson already produced UTF-8 bytes, and sending
+        # them as-is skips the text-frame encode on our side and the
+        # UTF-8 validation on the receiver's (loads accepts bytes)
+        payload = dumps_bytes(message.to_dict())
 
-        for node_id, connection in self.connections.items():
-            try:
-                await connection.send(message_json)
-            except Exception as e:
-                self.logger.error(f"Failed to send to peer {node_id}: {e}")
+        if not self.connections:
+            return
+
+        # Concurrent sends: broadcast latency is the slowest peer, not the
+        # sum of every peer's RTT
+        peers = list(self.connections.items())
+        results = await asyncio.gather(
+            *(connection.send(payload) for _, connection in peers),
+            return_exceptions=True)
+        for (node_id, _), result in zip(peers, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Failed to send to peer {node_id}: {result}")
 
     async def handle_message(self, data: dict):
         """Handle incoming consensus message"""
         try:
             message = Message(
-                phase=Phase(data["phase"]),
+                phase=_PHASE[data["phase"]],
                 digest=data["digest"],
                 node_id=data["node_id"],
                 signature=data["signature"],
                 timestamp=data["timestamp"],
-                view=data.get("view", 0)
+                view=data.get("view", 0),
+                public_key=data.get("public_key", "")
             )
 
-            # FIXED: Skip signature verification in single node mode
-            if not self.single_node_mode:
-                message_bytes = f"{message.phase.value}:{message.digest}:{message.view}".encode()
-                if not self.bls.verify(data.get("public_key", ""), message_bytes, message.signature):
+            # FIXED: Skip signature verification in single node mode.
+            # PREPARE/COMMIT verification is deferred to quorum time, where
+            # the whole vote set is checked with one aggregate pairing
+            # instead of one pairing per message.
+            if not self.single_node_mode and message.phase == Phase.PRE_PREPARE:
+                if not self.bls.verify(message.public_key, message.signed_bytes(),
+                                       message.signature):
                     self.logger.warning(f"Invalid signature from node {message.node_id}")
                     return
 
@@ -230,18 +379,55 @@ class PBFTNode:
             phase=Phase.PREPARE,
             digest=message.digest,
             node_id=self.node_id,
-            signature=self.bls.sign(f"prepare:{message.digest}:{self.view}".encode()),
-            timestamp=int(time.time() * 1000),
+            signature=self._sign_phase('prepare', message.digest, self.view),
+            timestamp=_now_ms(),
             view=self.view
         )
 
         await self.broadcast_message(prepare_msg)
         self.logger.info(f"Sent PREPARE for digest {message.digest[:16]}...")
 
+    async def _verify_votes(self, messages: List[Message]) -> List[Message]:
+        """Batch-verify a vote set off the event loop, returning valid votes.
+
+        The aggregate check verifies the whole batch with one pairing; only
+        if it fails (some peer sent garbage) do we pay per-signature
+        verification to drop the offenders.
+        """
+        loop = asyncio.get_running_loop()
+        public_keys = [m.public_key for m in messages]
+        signed = [m.signed_bytes() for m in messages]
+        signatures = [m.signature for m in messages]
+
+        if await loop.run_in_executor(
+                None, self.bls.batch_verify, public_keys, signed, signatures):
+            return messages
+
+        def _filter():
+            return [m for m in messages
+                    if self.bls.verify(m.public_key, m.signed_bytes(), m.signature)]
+
+        valid = await loop.run_in_executor(None, _filter)
+        dropped = len(messages) - len(valid)
+        if dropped:
+            self.logger.warning(f"Dropped {dropped} vote(s) with invalid signatures")
+        return valid
+
     async def handle_prepare(self, message: Message):
         """Handle PREPARE message"""
         digest = message.digest
 
+        # Already past PREPARE quorum: a straggler would only regrow the
+        # vote state that commit-time cleanup removes
+        if digest in self.prepared_digests:
+            return
+        self._note_round(digest)
+
+        voters = self._prepare_voters.setdefault(digest, set())
+        if message.node_id in voters:
+            return
+        voters.add(message.node_id)
+
         if digest not in self.prepare_messages:
             self.prepare_messages[digest] = []
 
@@ -249,14 +435,23 @@ class PBFTNode:
 
         if (len(self.prepare_messages[digest]) >= self.required_votes and
                 digest not in self.prepared_digests):
-            self.prepared_digests.add(digest)
+            if not self.single_node_mode:
+                valid = await self._verify_votes(self.prepare_messages[digest])
+                self.prepare_messages[digest] = valid
+                # A node whose vote was dropped may still send a valid
+                # re-vote; keep the dedupe set in step with the vote list
+                # so that re-vote is not discarded as a duplicate
+                voters.intersection_update(m.node_id for m in valid)
+                if len(valid) < self.required_votes:
+                    return
+            self._track_digest(self.prepared_digests, self._prepared_order, digest)
 
             commit_msg = Message(
                 phase=Phase.COMMIT,
                 digest=digest,
                 node_id=self.node_id,
-                signature=self.bls.sign(f"commit:{digest}:{self.view}".encode()),
-                timestamp=int(time.time() * 1000),
+                signature=self._sign_phase('commit', digest, self.view),
+                timestamp=_now_ms(),
                 view=self.view
             )
 
@@ -267,21 +462,67 @@ class PBFTNode:
         """Handle COMMIT message"""
         digest = message.digest
 
+        # A straggler for an already-committed digest would re-seed
+        # _commit_aggregates with nothing left to pop it
+        if digest in self.committed_digests:
+            return
+        self._note_round(digest)
+
+        voters = self._commit_voters.setdefault(digest, set())
+        if message.node_id in voters:
+            return
+        voters.add(message.node_id)
+
         if digest not in self.commit_messages:
             self.commit_messages[digest] = []
 
         self.commit_messages[digest].append(message)
 
+        # Fold the vote into the running aggregate (BLS aggregation is
+        # associative, so pairwise folding equals one-shot aggregation)
+        running = self._commit_aggregates.get(digest)
+        if running is None:
+            self._commit_aggregates[digest] = message.signature
+        else:
+            self._commit_aggregates[digest] = self.bls.aggregate(
+                [running, message.signature])
+
         # Check if we have enough COMMIT messages
         if (len(self.commit_messages[digest]) >= self.required_votes and
                 digest not in self.committed_digests):
 
-            self.committed_digests.add(digest)
+            if not self.single_node_mode:
+                votes_before = len(self.commit_messages[digest])
+                valid = await self._verify_votes(self.commit_messages[digest])
+                self.commit_messages[digest] = valid
+                # As in handle_prepare: dropped voters get to re-vote
+                voters.intersection_update(m.node_id for m in valid)
+                if len(valid) < self.required_votes:
+                    return
+                if len(valid) != votes_before:
+                    # A bad vote was dropped; the running fold included it,
+                    # so rebuild the aggregate from the surviving votes
+                    self._commit_aggregates[digest] = self.bls.aggregate(
+                        [m.signature for m in valid])
+
+            self._track_digest(self.committed_digests, self._committed_order, digest)
             self.logger.info(f"✅ CONSENSUS REACHED for digest {digest[:16]}...")
 
-            # Execute the committed operation
+            votes = self.commit_messages[digest]
+            # Round is over: drop the per-digest vote lists so they don't
+            # accumulate across the node's lifetime
+            self.prepare_messages.pop(digest, None)
+            self.commit_messages.pop(digest, None)
+            self._prepare_voters.pop(digest, None)
+            self._commit_voters.pop(digest, None)
+
+            # Execute the committed operation (callback receives plain dicts,
+            # matching the single-node propose path)
             if self.on_commit_callback:
-                await self.on_commit_callback(digest, self.commit_messages[digest])
+                await self.on_commit_callback(
+                    digest, [m.to_dict() for m in votes])
+            else:
+                self._commit_aggregates.pop(digest, None)
 
     async def propose(self, digest: str):
         """Propose a new value (only primary can do this)"""
@@ -300,14 +541,15 @@ class PBFTNode:
                 'phase': 'commit',
                 'digest': digest,
                 'node_id': self.node_id,
-                'signature': self.bls.sign(f"commit:{digest}:{self.view}".encode()),
-                'timestamp': int(time.time() * 1000),
+                'signature': self._sign_phase('commit', digest, self.view),
+                'timestamp': _now_ms(),
                 'view': self.view
             }
 
             # Immediately commit in single node mode
+            self._commit_aggregates[digest] = mock_commit_message['signature']
             if digest not in self.committed_digests:
-                self.committed_digests.add(digest)
+                self._track_digest(self.committed_digests, self._committed_order, digest)
                 if self.on_commit_callback:
                     await self.on_commit_callback(digest, [mock_commit_message])
             return
@@ -317,14 +559,18 @@ class PBFTNode:
             phase=Phase.PRE_PREPARE,
             digest=digest,
             node_id=self.node_id,
-            signature=self.bls.sign(f"pre_prepare:{digest}:{self.view}".encode()),
-            timestamp=int(time.time() * 1000),
+            signature=self._sign_phase('pre_prepare', digest, self.view),
+            timestamp=_now_ms(),
             view=self.view
         )
 
         await self.broadcast_message(pre_prepare_msg)
         self.logger.info(f"Proposed digest {digest[:16]}...")
 
+    def pop_aggregate(self, digest: str) -> str:
+        """Return and forget the pre-folded COMMIT aggregate for a digest"""
+        return self._commit_aggregates.pop(digest, "")
+
     def set_commit_callback(self, callback):
         """Set callback function for when consensus is reached"""
         self.on_commit_callback = callback
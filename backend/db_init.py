@@ -41,13 +41,15 @@ def seed_data():
             NodeModel(node_id=3, address="http://localhost:7003", status="active"),
         ]
 
-        for node in nodes:
-            existing = db.query(NodeModel).filter(NodeModel.node_id == node.node_id).first()
-            if not existing:
-                db.add(node)
-                print(f"➕ Added node {node.node_id}")
-            else:
-                print(f"✅ Node {node.node_id} already exists")
+        # One SELECT for the existing ids and one bulk INSERT for the rest,
+        # instead of a SELECT-then-add round trip per node
+        existing_ids = {row[0] for row in db.query(NodeModel.node_id).all()}
+        new_nodes = [node for node in nodes if node.node_id not in existing_ids]
+        if new_nodes:
+            db.bulk_save_objects(new_nodes)
+            print(f"➕ Added {len(new_nodes)} node(s)")
+        if existing_ids:
+            print(f"✅ {len(existing_ids)} node(s) already exist")
 
         # Create sample integrity event
         existing_event = db.query(IntegrityEvent).filter(
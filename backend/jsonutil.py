@@ -0,0 +1,32 @@
+import json
+import logging
+from typing import Any
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+    logging.warning("orjson not available, using stdlib json")
+
+
+def dumps(obj: Any) -> str:
+    """Serialize to a compact JSON string with the fastest available encoder"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Serialize to compact JSON bytes without the str round-trip"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def loads(data: Any) -> Any:
+    """Deserialize JSON from str or bytes"""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
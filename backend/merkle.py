@@ -1,47 +1,266 @@
+"""Merkle tree construction and proofs over double-SHA-256.
+
+Level hashing funnels through _hash_level, which is the seam for an
+accelerated batch backend (multi-buffer SIMD or GPU hashing of a whole
+level per call) should one become worth shipping; measurements so far put
+the crossover well beyond the file counts this agent sees. merkle_root
+streams pair-by-pair through MerkleEdge when no backend is installed and
+switches to level-at-a-time reduction through the seam when one is.
+"""
 import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
 
 LEAF_PREFIX = b'\x00'
 NODE_PREFIX = b'\x01'
 
+_sha256 = hashlib.sha256
+
+# Template hashers with the prefix byte already absorbed; .copy() restores
+# that state cheaper than re-feeding the prefix through a fresh hasher.
+# Safe because the templates themselves are never updated after init.
+_LEAF_HASHER = hashlib.sha256(LEAF_PREFIX)
+_NODE_HASHER = hashlib.sha256(NODE_PREFIX)
+
+# Installable batch hasher for binary level reduction. When set, it receives
+# the prefixed pair blocks for one whole level and returns their double-SHA-256
+# digests in order — one backend call per level instead of one hash per pair,
+# which is where a multi-buffer SIMD implementation pays off.
+_batch_hasher = None
+
+
+def set_batch_hasher(fn) -> None:
+    """Install (or clear, with None) an accelerated level hasher.
+
+    `fn(blocks: List[bytes]) -> List[bytes]` must map each
+    NODE_PREFIX+left+right block to its double-SHA-256 digest.
+    """
+    global _batch_hasher
+    _batch_hasher = fn
+
 
 def _hash(prefix: bytes, *data: bytes) -> bytes:
-    """Create SHA-512 hash with prefix"""
-    hasher = hashlib.sha512()
+    """Create double-SHA-256 hash with prefix.
+
+    Internal nodes are two 32-byte digests; SHA-256's 64-byte block wastes
+    far less padding on them than SHA-512's 128-byte block, and the double
+    hash guards against length-extension on the tree structure.
+    """
+    hasher = hashlib.sha256()
     hasher.update(prefix)
     for chunk in data:
         hasher.update(chunk)
-    return hasher.digest()
+    return hashlib.sha256(hasher.digest()).digest()
 
 
 def hash_leaf(data: bytes) -> bytes:
     """Hash a leaf node with leaf prefix"""
-    return _hash(LEAF_PREFIX, data)
+    hasher = _LEAF_HASHER.copy()
+    hasher.update(data)
+    return _sha256(hasher.digest()).digest()
 
 
 def hash_node(left: bytes, right: bytes) -> bytes:
     """Hash an internal node with node prefix"""
-    return _hash(NODE_PREFIX, left, right)
+    hasher = _NODE_HASHER.copy()
+    hasher.update(left + right)
+    return _sha256(hasher.digest()).digest()
+
+
+def _hash_level(level: List[bytes], arity: int = 2) -> List[bytes]:
+    """Reduce one tree level to the next, duplicating the trailing node to
+    fill an incomplete final group.
+
+    Single choke point for level reduction so an accelerated batch hasher
+    can be dropped in without touching the tree logic. Arity 3 packs three
+    32-byte digests per node, which costs the same two SHA-256 compressions
+    as a pair does, cutting total compressions by ~1/3 and depth to log3 N.
+    """
+    if arity == 2:
+        np = NODE_PREFIX
+        if _batch_hasher is not None:
+            blocks = [np + level[i] + level[i + 1]
+                      for i in range(0, len(level) - 1, 2)]
+            if len(level) & 1:
+                last = level[-1]
+                blocks.append(np + last + last)
+            return _batch_hasher(blocks)
+
+        # Inline the double hash: one Python-level call per pair (the
+        # sha256 constructor) instead of three, with prefix+left+right
+        # concatenated into a single C call
+        s = _sha256
+        next_level = [s(s(np + level[i] + level[i + 1]).digest()).digest()
+                      for i in range(0, len(level) - 1, 2)]
+        if len(level) & 1:
+            # Odd number of nodes, duplicate the last one
+            last = level[-1]
+            next_level.append(s(s(np + last + last).digest()).digest())
+        return next_level
+
+    next_level = []
+    for i in range(0, len(level), arity):
+        group = level[i:i + arity]
+        group.extend(group[-1:] * (arity - len(group)))
+        next_level.append(_hash(NODE_PREFIX, *group))
+    return next_level
+
+
+class MerkleEdge:
+    """Streaming Merkle builder holding only the O(log n) leading edge.
+
+    Leaves are folded into complete subtrees as they arrive, so the peak
+    memory is one digest per tree level instead of one per leaf, and
+    hashing overlaps with whatever produces the leaves. Produces the same
+    root as `merkle_root` (odd nodes are duplicated at each level).
+    """
+
+    def __init__(self):
+        # Stack of (height, digest) with strictly decreasing heights
+        self._edge: List[tuple[int, bytes]] = []
+        self.leaf_count = 0
+
+    def push(self, leaf: bytes) -> None:
+        """Add a leaf and fold any completed 2^k subtrees"""
+        # Fold with locals only: this runs once per leaf, so global lookups
+        # and tuple repacking in the inner while loop are worth avoiding
+        edge = self._edge
+        node = hash_node
+        digest = hash_leaf(leaf)
+        height = 0
+        while edge and edge[-1][0] == height:
+            _, left = edge.pop()
+            digest = node(left, digest)
+            height += 1
+        edge.append((height, digest))
+        self.leaf_count += 1
+
+    def copy(self) -> "MerkleEdge":
+        """Cheap snapshot: O(log n) tuples, shared immutable digests.
+
+        Lets a caller trial-append leaves (e.g. “root if this new file
+        were included”) without rebuilding from the full leaf set.
+        """
+        clone = MerkleEdge()
+        clone._edge = self._edge.copy()
+        clone.leaf_count = self.leaf_count
+        return clone
+
+    def root(self) -> bytes:
+        """Fold the remaining edge into the final root (non-destructive)"""
+        if not self._edge:
+            return b''
+
+        edge = self._edge
+        height, current = edge[-1]
+        for sibling_height, sibling in reversed(edge[:-1]):
+            # Promote the partial subtree by duplication until it reaches
+            # the height of the next completed subtree to its left
+            while height < sibling_height:
+                current = hash_node(current, current)
+                height += 1
+            current = hash_node(sibling, current)
+            height += 1
+        return current
+
+
+class LazyMerkle:
+    """Deferred-root tree: mutations mark it dirty, root() hashes once.
+
+    A burst of N leaf updates between reads costs a single tree build at
+    the next root() call instead of N eager rebuilds. Clean reads return
+    the cached root without touching the hasher.
+    """
+
+    def __init__(self, leaves: List[bytes] = None):
+        self.leaves: List[bytes] = list(leaves) if leaves else []
+        self._root_cache = b''
+        self.dirty = bool(self.leaves)
 
+    def append(self, leaf: bytes) -> None:
+        self.leaves.append(leaf)
+        self.dirty = True
+
+    def update_leaf(self, index: int, leaf: bytes) -> None:
+        self.leaves[index] = leaf
+        self.dirty = True
+
+    def root(self) -> bytes:
+        if self.dirty:
+            self._root_cache = merkle_root(self.leaves)
+            self.dirty = False
+        return self._root_cache
+
+
+def merkle_root(leaves: List[bytes], arity: int = 2) -> bytes:
+    """Calculate Merkle root of given leaves.
+
+    The default binary tree is what merkle_proof/verify_proof understand;
+    arity 3 gives a denser tree (fewer compressions, shallower) for callers
+    that only need the root.
+    """
+    if arity == 2 and _batch_hasher is None:
+        # Pair-by-pair streaming edge; bypasses _hash_level, so only
+        # taken when no batch backend is installed
+        edge = MerkleEdge()
+        for leaf in leaves:
+            edge.push(leaf)
+        return edge.root()
 
-def merkle_root(leaves: List[bytes]) -> bytes:
-    """Calculate Merkle root of given leaves"""
     if not leaves:
         return b''
-
     current_level = [hash_leaf(leaf) for leaf in leaves]
-
     while len(current_level) > 1:
-        next_level = []
-        for i in range(0, len(current_level), 2):
-            if i + 1 == len(current_level):
-                # Odd number of nodes, duplicate the last one
-                next_level.append(hash_node(current_level[i], current_level[i]))
-            else:
-                next_level.append(hash_node(current_level[i], current_level[i + 1]))
-        current_level = next_level
+        current_level = _hash_level(current_level, arity)
+    return current_level[0]
+
+
+def _promoted_subtree_root(leaves: List[bytes], height: int) -> bytes:
+    """Reduce a leaf block through exactly `height` levels.
+
+    Blocks that are perfect 2^height subtrees come out as their plain
+    root; a trailing partial block gets the same duplicate-promotion the
+    full tree would apply, because odd counts at every level below
+    `height` can only occur inside the trailing block.
+    """
+    level = [hash_leaf(leaf) for leaf in leaves]
+    for _ in range(height):
+        level = _hash_level(level)
+    return level[0]
+
+
+def merkle_root_parallel(leaves: List[bytes], workers: int = None,
+                         min_leaves: int = 4096) -> bytes:
+    """Merkle root with subtree hashing fanned out over a process pool.
 
-    return current_level[0] if current_level else b''
+    Splits the leaves into power-of-two aligned blocks, hashes each
+    block's subtree in a worker, then folds the block roots sequentially.
+    Produces exactly the same root as merkle_root. Below `min_leaves`
+    the pool overhead dominates and the sequential builder runs instead.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if len(leaves) < min_leaves or workers < 2:
+        return merkle_root(leaves)
+
+    # Block size: the smallest power of two giving at most `workers` blocks
+    height = max((len(leaves) + workers - 1) // workers - 1, 1).bit_length()
+    block = 1 << height
+    chunks = [leaves[i:i + block] for i in range(0, len(leaves), block)]
+    if len(chunks) == 1:
+        # A lone block would be promoted past its natural height
+        return merkle_root(leaves)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        roots = list(pool.map(_promoted_subtree_root, chunks,
+                              [height] * len(chunks)))
+
+    # Block roots are internal nodes at a uniform height; fold them with
+    # node hashing only (no leaf prefix)
+    while len(roots) > 1:
+        roots = _hash_level(roots)
+    return roots[0]
 
 
 def merkle_proof(leaves: List[bytes], index: int) -> List[bytes]:
@@ -57,17 +276,14 @@ def merkle_proof(leaves: List[bytes], index: int) -> List[bytes]:
         if current_index % 2 == 0:
             if current_index + 1 < len(current_level):
                 proof.append(current_level[current_index + 1])
+            else:
+                # Trailing odd node is hashed with itself; the proof must
+                # carry that duplicate or verification skips the level
+                proof.append(current_level[current_index])
         else:
             proof.append(current_level[current_index - 1])
 
-        next_level = []
-        for i in range(0, len(current_level), 2):
-            if i + 1 == len(current_level):
-                next_level.append(hash_node(current_level[i], current_level[i]))
-            else:
-                next_level.append(hash_node(current_level[i], current_level[i + 1]))
-
-        current_level = next_level
+        current_level = _hash_level(current_level)
         current_index //= 2
 
     return proof
@@ -75,29 +291,60 @@ def merkle_proof(leaves: List[bytes], index: int) -> List[bytes]:
 
 def verify_proof(leaf: bytes, proof: List[bytes], root: bytes, index: int) -> bool:
     """Verify Merkle proof for given leaf"""
+    # Interpreter-lean loop: template-copy hashing inline, the position
+    # walked as a bit shift, and the hash bindings hoisted out of the loop
+    s = _sha256
+    tmpl = _NODE_HASHER
     current_hash = hash_leaf(leaf)
-    current_index = index
 
     for sibling in proof:
-        if current_index % 2 == 0:
-            current_hash = hash_node(current_hash, sibling)
+        hasher = tmpl.copy()
+        if index & 1:
+            hasher.update(sibling + current_hash)
         else:
-            current_hash = hash_node(sibling, current_hash)
-        current_index //= 2
+            hasher.update(current_hash + sibling)
+        current_hash = s(hasher.digest()).digest()
+        index >>= 1
 
     return current_hash == root
 
 
 class MerkleTree:
+    """Merkle tree that keeps every level for O(log n) proof extraction.
+
+    merkle_proof rebuilds the tree per call; holding the levels trades
+    O(n) memory (the leaf level dominates) for proofs that are pure list
+    indexing.
+    """
+
     def __init__(self, leaves: List[bytes]):
         self.leaves = leaves
-        self.root = merkle_root(leaves)
+        self.levels: List[List[bytes]] = []
+        if leaves:
+            level = [hash_leaf(leaf) for leaf in leaves]
+            self.levels.append(level)
+            while len(level) > 1:
+                level = _hash_level(level)
+                self.levels.append(level)
+            self.root = level[0]
+        else:
+            self.root = b''
 
     def get_root(self):
         return self.root
 
     def get_proof(self, index: int):
-        return merkle_proof(self.leaves, index)
+        if not self.leaves or index >= len(self.leaves):
+            return []
+        proof = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling >= len(level):
+                # Trailing odd node pairs with its own duplicate
+                sibling = index
+            proof.append(level[sibling])
+            index >>= 1
+        return proof
 
     def verify(self, leaf: bytes, proof: List[bytes], index: int) -> bool:
         return verify_proof(leaf, proof, self.root, index)
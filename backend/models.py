@@ -1,45 +1,140 @@
+import hashlib
 import os
+from contextlib import contextmanager
 from datetime import datetime
+from operator import attrgetter
 from typing import Optional
-from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, Boolean, Text, create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import (Column, Integer, String, LargeBinary, DateTime, Boolean,
+                        Text, Index, TypeDecorator, create_engine, event, text)
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
 from sqlalchemy.engine import Engine
 
-Base = declarative_base()
+
+class Base(DeclarativeBase):
+    """Declarative base in the SQLAlchemy 2.0 class style"""
+
+# Single binding for column defaults: one global load per evaluation
+# instead of re-resolving datetime.utcnow attribute chains on every insert
+_UTCNOW = datetime.utcnow
+
+
+class JSONText(TypeDecorator):
+    """Text column for JSON payloads, encoded through jsonutil on write.
+
+    Call sites can hand over dicts/lists directly; strings pass through
+    untouched so rows written under the old ad-hoc json.dumps convention
+    keep working. Values come back as the stored string — the API exposes
+    details as a JSON string and decoding here would change its shape.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        try:
+            from .jsonutil import dumps
+        except ImportError:
+            from jsonutil import dumps
+        return dumps(value)
+
+
+def _make_to_dict(scalar_cols, dt_cols):
+    """Generate a to_dict for a model class.
+
+    One attrgetter call fetches every scalar column at C speed; datetime
+    columns get the usual isoformat-or-None treatment. Replaces six
+    hand-written methods doing 8-10 interpreted attribute fetches per row
+    on the API serialization paths.
+    """
+    getter = attrgetter(*scalar_cols)
+
+    def to_dict(self):
+        d = dict(zip(scalar_cols, getter(self)))
+        for col in dt_cols:
+            value = getattr(self, col)
+            d[col] = value.isoformat() if value else None
+        return d
+
+    return to_dict
+
 
 # Database configuration - use relative paths
 DATABASE_URL = os.getenv('SFIM_DB', 'sqlite:///./data/sfim_audit.db')
 
+# Content-addressed blob store: raw file bytes live on disk under
+# <BLOB_DIR>/<hash[:2]>/<hash> instead of inline LargeBinary rows, so
+# SELECTs on file_storage stop dragging whole files through SQLite pages
+BLOB_DIR = os.getenv('SFIM_BLOB_DIR', './data/blobs')
+
+
+def blob_path(file_hash: str) -> str:
+    """Filesystem path for a content-addressed blob"""
+    return os.path.join(BLOB_DIR, file_hash[:2], file_hash)
+
+
+def store_blob(file_hash: str, data: bytes) -> str:
+    """Write file bytes to the blob store, keyed by their hash.
+
+    Content-addressed, so an existing file is already the right bytes
+    and the write is skipped. Returns the blob path.
+    """
+    path = blob_path(file_hash)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    return path
+
+
+def read_blob(file_hash: str) -> Optional[bytes]:
+    """Read blob bytes back, or None if absent"""
+    try:
+        with open(blob_path(file_hash), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
 
 class IntegrityEvent(Base):
     """Database model for file integrity events"""
     __tablename__ = 'integrity_events'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    merkle_root = Column(String(128), nullable=False, index=True)
-    file_path = Column(String(512), nullable=True)
-    file_hash = Column(String(128), nullable=True)
-    bls_signature = Column(String(256), nullable=True)
+    # Digests stay hex TEXT rather than raw BLOBs: the consensus digest,
+    # WebSocket payloads, REST responses and the in-memory registries all
+    # pass hex strings, so binary-at-rest would just move the hex
+    # conversion to every query boundary for ~32 bytes/row saved.
+    # Roots are double-SHA-256: 64 hex chars
+    merkle_root = Column(String(64), nullable=False, index=True)
+    file_path = Column(Text, nullable=True)
+    file_hash = Column(String(64), nullable=True)
+    # Aggregated BLS signature is 96 bytes -> 192 hex chars
+    bls_signature = Column(String(192), nullable=True)
     node_id = Column(Integer, nullable=False)
     consensus_round = Column(Integer, nullable=False)
     status = Column(String(32), nullable=False, default='pending')
-    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    timestamp = Column(DateTime, nullable=False, default=_UTCNOW)
+    created_at = Column(DateTime, nullable=False, default=_UTCNOW)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'merkle_root': self.merkle_root,
-            'file_path': self.file_path,
-            'file_hash': self.file_hash,
-            'bls_signature': self.bls_signature,
-            'node_id': self.node_id,
-            'consensus_round': self.consensus_round,
-            'status': self.status,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    __table_args__ = (
+        # Consensus-path lookups filter by round and node together
+        Index('ix_events_round_node', 'consensus_round', 'node_id'),
+        # Partial index: the pending scan only ever reads a sliver of the
+        # table, so the index stays tiny no matter how the history grows
+        Index('ix_events_pending', 'status',
+              sqlite_where=text("status = 'pending'"),
+              postgresql_where=text("status = 'pending'")),
+    )
+
+    to_dict = _make_to_dict(
+        ('id', 'merkle_root', 'file_path', 'file_hash', 'bls_signature',
+         'node_id', 'consensus_round', 'status'),
+        ('timestamp', 'created_at'))
 
 
 class FileStorage(Base):
@@ -47,30 +142,28 @@ class FileStorage(Base):
     __tablename__ = 'file_storage'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    file_name = Column(String(512), nullable=False)
-    file_hash = Column(String(128), nullable=False, unique=True, index=True)
+    file_name = Column(Text, nullable=False)
+    file_hash = Column(String(64), nullable=False, unique=True, index=True)
     file_size = Column(Integer, nullable=False)
     mime_type = Column(String(128), nullable=True)
-    file_data = Column(LargeBinary, nullable=False)
-    merkle_root = Column(String(128), nullable=False, index=True)
+    # Bytes live in the content-addressed blob store (store_blob below);
+    # the column survives, nullable, for rows written before the split
+    file_data = Column(LargeBinary, nullable=True)
+    merkle_root = Column(String(64), nullable=False, index=True)
     node_id = Column(Integer, nullable=False)
     consensus_round = Column(Integer, nullable=False)
     status = Column(String(32), nullable=False, default='pending')
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=_UTCNOW)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'file_name': self.file_name,
-            'file_hash': self.file_hash,
-            'file_size': self.file_size,
-            'mime_type': self.mime_type,
-            'merkle_root': self.merkle_root,
-            'node_id': self.node_id,
-            'consensus_round': self.consensus_round,
-            'status': self.status,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    __table_args__ = (
+        # Startup mirror load and retention cleanup both filter on status
+        Index('ix_files_status', 'status'),
+    )
+
+    to_dict = _make_to_dict(
+        ('id', 'file_name', 'file_hash', 'file_size', 'mime_type',
+         'merkle_root', 'node_id', 'consensus_round', 'status'),
+        ('created_at',))
 
 
 class TPMQuote(Base):
@@ -84,19 +177,18 @@ class TPMQuote(Base):
     signature = Column(LargeBinary, nullable=False)
     is_valid = Column(Boolean, nullable=False, default=False)
     trust_level = Column(String(32), nullable=False, default='unknown')
-    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    timestamp = Column(DateTime, nullable=False, default=_UTCNOW)
+    created_at = Column(DateTime, nullable=False, default=_UTCNOW)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'node_id': self.node_id,
-            'nonce': self.nonce,
-            'is_valid': self.is_valid,
-            'trust_level': self.trust_level,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    __table_args__ = (
+        # "Latest quote for node" = ORDER BY id DESC LIMIT 1 per node_id;
+        # the composite index serves it with a backward index walk
+        Index('ix_quotes_node_latest', 'node_id', 'id'),
+    )
+
+    to_dict = _make_to_dict(
+        ('id', 'node_id', 'nonce', 'is_valid', 'trust_level'),
+        ('timestamp', 'created_at'))
 
 
 class NodeModel(Base):
@@ -105,28 +197,22 @@ class NodeModel(Base):
 
     id = Column(Integer, primary_key=True)
     node_id = Column(Integer, nullable=False, unique=True, index=True)
-    address = Column(String(256), nullable=False)
-    public_key = Column(String(512), nullable=True)
+    address = Column(Text, nullable=False)
+    public_key = Column(Text, nullable=True)
     status = Column(String(32), nullable=False, default='active')
     last_seen = Column(DateTime, nullable=True)
     last_attestation = Column(DateTime, nullable=True)
     trust_score = Column(Integer, nullable=False, default=100)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=_UTCNOW)
+    updated_at = Column(DateTime, nullable=False, default=_UTCNOW)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'node_id': self.node_id,
-            'address': self.address,
-            'public_key': self.public_key,
-            'status': self.status,
-            'last_seen': self.last_seen.isoformat() if self.last_seen else None,
-            'last_attestation': self.last_attestation.isoformat() if self.last_attestation else None,
-            'trust_score': self.trust_score,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    to_dict = _make_to_dict(
+        ('id', 'node_id', 'address', 'public_key', 'status', 'trust_score'),
+        ('last_seen', 'last_attestation', 'created_at', 'updated_at'))
+
+
+# Historical import alias: some callers referred to the node table as Node
+Node = NodeModel
 
 
 class AuditLog(Base):
@@ -137,20 +223,131 @@ class AuditLog(Base):
     event_type = Column(String(64), nullable=False, index=True)
     node_id = Column(Integer, nullable=True)
     message = Column(Text, nullable=False)
-    details = Column(Text, nullable=True)
+    details = Column(JSONText, nullable=True)
     severity = Column(String(16), nullable=False, default='info')
-    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
+    timestamp = Column(DateTime, nullable=False, default=_UTCNOW)
+
+    to_dict = _make_to_dict(
+        ('id', 'event_type', 'node_id', 'message', 'details', 'severity'),
+        ('timestamp',))
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'event_type': self.event_type,
-            'node_id': self.node_id,
-            'message': self.message,
-            'details': self.details,
-            'severity': self.severity,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None
-        }
+
+class MerkleRootCache(Base):
+    """Memoized Merkle roots keyed by a leaf-set fingerprint.
+
+    Content-addressed: a different leaf set hashes to a different key, so
+    entries never go stale and need no explicit invalidation.
+    """
+    __tablename__ = 'merkle_root_cache'
+
+    leaves_fingerprint = Column(String(64), primary_key=True)
+    root = Column(String(64), nullable=False)
+    computed_at = Column(DateTime, nullable=False, default=_UTCNOW)
+
+
+def cached_merkle_root(leaves) -> bytes:
+    """Merkle root for a leaf set, memoized in the database.
+
+    Re-validation over an unchanged leaf set becomes a primary-key lookup
+    instead of an O(N) hash walk. merkle_root is order-dependent, so the
+    fingerprint hashes the leaves in the given order — two orderings of
+    the same leaves are different trees and must not share a cache entry.
+    Runs in its own short-lived session so it never commits a caller's
+    unrelated pending state.
+    """
+    try:
+        from .merkle import merkle_root as _merkle_root
+    except ImportError:
+        from merkle import merkle_root as _merkle_root
+
+    fingerprint = hashlib.sha256(b''.join(leaves)).hexdigest()
+    with session_scope() as session:
+        row = session.get(MerkleRootCache, fingerprint)
+        if row is not None:
+            return bytes.fromhex(row.root)
+
+        root = _merkle_root(leaves)
+        session.merge(MerkleRootCache(leaves_fingerprint=fingerprint, root=root.hex()))
+    return root
+
+
+def _set_sqlite_ro_pragmas(dbapi_connection, connection_record):
+    """Tune read-only SQLite connections.
+
+    Read-only connections cannot switch the journal mode (the writer has
+    already put the file in WAL), so only the busy timeout applies here.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune SQLite on every new connection.
+
+    WAL lets readers (API endpoints, feed queries) run concurrently with
+    the consensus commit writer instead of serializing on the journal;
+    synchronous=NORMAL drops the per-commit fsync to a WAL append; the
+    busy timeout absorbs short lock windows instead of raising
+    SQLITE_BUSY.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    # Keep temp B-trees off disk, let reads go through the page cache via
+    # mmap (256 MiB ceiling), and give the page cache 64 MiB (negative =
+    # KiB) so the hot index pages for digest lookups stay resident
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
+def _migrate_legacy_sqlite(engine):
+    """Bring a pre-existing SQLite file up to the current schema.
+
+    create_all only creates tables that are missing entirely: it neither
+    relaxes the legacy NOT NULL on file_storage.file_data (bytes now live
+    in the blob store) nor adds newer indexes to tables that already
+    exist. Both are handled here so the shipped/legacy databases keep
+    working without a manual rebuild.
+    """
+    with engine.begin() as conn:
+        cols = conn.exec_driver_sql("PRAGMA table_info(file_storage)").fetchall()
+    legacy_cols = {c[1] for c in cols}
+    file_data_notnull = any(c[1] == 'file_data' and c[3] for c in cols)
+
+    if file_data_notnull:
+        # SQLite cannot drop a NOT NULL in place; rebuild the table.
+        # Index names are database-global, so the old ones must go
+        # before table.create() re-issues them against the new table
+        table = FileStorage.__table__
+        shared = ", ".join(c.name for c in table.columns if c.name in legacy_cols)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "ALTER TABLE file_storage RENAME TO file_storage_legacy")
+            stale = conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type='index' "
+                "AND tbl_name='file_storage_legacy' "
+                "AND name NOT LIKE 'sqlite_%'").fetchall()
+            for (index_name,) in stale:
+                conn.exec_driver_sql(f'DROP INDEX "{index_name}"')
+        table.create(bind=engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"INSERT INTO file_storage ({shared}) "
+                f"SELECT {shared} FROM file_storage_legacy")
+            conn.exec_driver_sql("DROP TABLE file_storage_legacy")
+        print("✅ Rebuilt file_storage without the legacy file_data NOT NULL")
+
+    # checkfirst makes this a no-op for every index that already exists
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 # FIXED: Improved database setup with automatic legacy globals update
@@ -159,7 +356,9 @@ class DatabaseManager:
 
     def __init__(self):
         self.engine: Optional[Engine] = None
+        self.read_engine: Optional[Engine] = None
         self.SessionLocal: Optional[sessionmaker] = None
+        self.ReadSessionLocal: Optional[sessionmaker] = None
         self._initialized = False
 
     def init_database(self, database_url: str = None):
@@ -176,23 +375,57 @@ class DatabaseManager:
 
         # Configure engine
         if database_url.startswith('sqlite'):
+            # Single writer: SQLite serializes writes anyway, so one pooled
+            # connection avoids writers queueing inside the database
             self.engine = create_engine(
                 database_url,
                 echo=False,
+                pool_size=1,
+                max_overflow=0,
                 connect_args={"check_same_thread": False}
             )
+            event.listen(self.engine, "connect", _set_sqlite_pragmas)
+
+            # Separate read-only pool so the API/feed readers never contend
+            # with the writer connection for a pool slot; WAL (set by the
+            # writer) lets these run concurrently with commits
+            db_path = database_url.replace('sqlite:///', '')
+            # uri=true must live in the URL query string: the sqlite
+            # dialect only treats the database as a file: URI when it is
+            # there, and would otherwise absolutize "file:..." into a
+            # literal (nonexistent) path
+            self.read_engine = create_engine(
+                f"sqlite:///file:{db_path}?mode=ro&cache=private&uri=true",
+                echo=False,
+                pool_size=os.cpu_count() or 4,
+                connect_args={"check_same_thread": False}
+            )
+            event.listen(self.read_engine, "connect", _set_sqlite_ro_pragmas)
         else:
             self.engine = create_engine(database_url, echo=False)
+            self.read_engine = self.engine
 
-        # Create session factory
+        # Create session factory. expire_on_commit=False keeps attribute
+        # access after commit from triggering refresh SELECTs — the commit
+        # paths read back fields for broadcasts right after committing
         self.SessionLocal = sessionmaker(
             autocommit=False,
             autoflush=False,
+            expire_on_commit=False,
             bind=self.engine
         )
+        self.ReadSessionLocal = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False,
+            bind=self.read_engine
+        )
 
-        # Create all tables
+        # Create all tables, then reconcile pre-existing SQLite files
+        # with schema changes create_all cannot apply
         Base.metadata.create_all(bind=self.engine)
+        if database_url.startswith('sqlite'):
+            _migrate_legacy_sqlite(self.engine)
         self._initialized = True
 
         # FIXED: Automatically update legacy globals after initialization
@@ -207,6 +440,12 @@ class DatabaseManager:
             raise RuntimeError("❌ Database not initialized. Call init_database() first.")
         return self.SessionLocal()
 
+    def get_read_session(self):
+        """Get a read-only database session from the reader pool"""
+        if not self._initialized or self.ReadSessionLocal is None:
+            raise RuntimeError("❌ Database not initialized. Call init_database() first.")
+        return self.ReadSessionLocal()
+
     def is_initialized(self) -> bool:
         """Check if database is initialized"""
         return self._initialized and self.SessionLocal is not None
@@ -231,11 +470,38 @@ def get_db_session():
         session.close()
 
 
+def get_db_read_session():
+    """Get read-only database session for dependency injection"""
+    session = db_manager.get_read_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
 def create_db_session():
     """Create a new database session (direct access)"""
     return db_manager.get_session()
 
 
+@contextmanager
+def session_scope():
+    """Transactional session scope: commit on success, rollback on error.
+
+    Guarantees the connection goes back to the pool even when a query
+    raises, which the manual session/close call sites did not always do.
+    """
+    session = db_manager.get_session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
 # Legacy compatibility - these will be set after initialization
 engine: Optional[Engine] = None
 SessionLocal: Optional[sessionmaker] = None
@@ -246,9 +512,3 @@ def _update_legacy_globals():
     global engine, SessionLocal
     engine = db_manager.engine
     SessionLocal = db_manager.SessionLocal
-
-    # Verify the update worked
-    if SessionLocal is not None:
-        print("✅ Legacy globals updated successfully")
-    else:
-        print("⚠️ Legacy globals update failed - SessionLocal is still None")
\ No newline at end of file
@@ -2,26 +2,30 @@ import asyncio
 import os
 import sys
 import hashlib
-import json
 import logging
+import random
 import time
 import secrets
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Dict, Optional
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, File, UploadFile
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-import websockets
+from sqlalchemy import bindparam, insert, select
+from sqlalchemy.orm import Session, defer
 
 # Local imports
-from backend.merkle import merkle_root, MerkleTree
+from backend.merkle import MerkleEdge
+from backend.jsonutil import dumps_bytes, loads
 from backend.tpm_attest import TPMManager
 from backend.consensus import PBFTNode, BLSManager
-from backend.models import (db_manager, create_db_session, get_db_session, _update_legacy_globals,
+from backend.models import (db_manager, get_db_session, get_db_read_session,
+                            session_scope, blob_path, store_blob,
+                            _update_legacy_globals,
                             IntegrityEvent, FileStorage, TPMQuote, NodeModel, AuditLog)
 
 # Configuration with proper defaults
@@ -31,6 +35,8 @@ TOTAL_NODES = int(os.getenv('TOTAL_NODES', 4))
 PEERS = [peer.strip() for peer in os.getenv('PEERS', '').split(',') if peer.strip()]
 DATABASE_URL = os.getenv('SFIM_DB', f'sqlite:///./data/node{NODE_ID}_sfim.db')
 USE_SIMULATED_TPM = os.getenv('USE_SIMULATED_TPM', 'true').lower() == 'true'
+RETENTION_HOURS = int(os.getenv('RETENTION_HOURS', '24'))
+MAX_WS_UPLOAD = int(os.getenv('MAX_WS_UPLOAD_BYTES', str(256 * 1024 * 1024)))
 
 # Ensure data directory exists
 Path('./data').mkdir(exist_ok=True)
@@ -43,12 +49,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(f"SFIMNode-{NODE_ID}")
 
+
+def _now_ms() -> int:
+    """Wall-clock milliseconds without the float round-trip"""
+    return time.time_ns() // 1_000_000
+
+
+def _pack_pcrs(pcr_values: dict) -> bytes:
+    """Pack {pcr_index: digest} as 1-byte index + 32-byte digest records.
+
+    The column is a BLOB nothing reads back as text, so the old
+    hex-dict-to-JSON chain spent two allocations and a 2x size blow-up
+    per quote for nothing.
+    """
+    return b"".join(i.to_bytes(1, 'big') + v for i, v in sorted(pcr_values.items()))
+
 # Global variables
 tpm_manager: Optional[TPMManager] = None
 pbft_node: Optional[PBFTNode] = None
-connected_clients: List[WebSocket] = []
+# Per-client outbound queue + sender task, so one slow client never stalls
+# the commit path or the other clients
+connected_clients: Dict[WebSocket, tuple] = {}
+CLIENT_QUEUE_SIZE = int(os.getenv('CLIENT_QUEUE_SIZE', '256'))
 pending_uploads: Dict[str, dict] = {}
+# Reverse index so a commit wakes exactly the uploads waiting on its
+# digest instead of scanning every pending upload
+pending_by_root: Dict[str, set] = {}
+# Guards pending_uploads / pending_by_root mutations; critical sections
+# are short (dict ops only, never awaits)
+pending_lock = asyncio.Lock()
 blockchain_files: Dict[str, dict] = {}
+# Streaming Merkle frontier over the committed files, mirrored in-memory
+# so each upload can extend the tree in O(log N) hashes instead of a full
+# rebuild. Seeded once at startup, pushed on every consensus commit.
+committed_frontier = MerkleEdge()
+scheduler: Optional["PeriodicScheduler"] = None
+commit_writer_task: Optional[asyncio.Task] = None
+
+# Reused Core INSERT statements for hot-path writes; executing these skips
+# the ORM unit-of-work flush and hits SQLAlchemy's compiled-statement cache
+# on every call after the first
+_INSERT_QUOTE = insert(TPMQuote)
+_INSERT_AUDIT = insert(AuditLog)
+_INSERT_FILE = insert(FileStorage)
+_INSERT_EVENT = insert(IntegrityEvent)
+
+# Prebuilt SELECTs for /api/verify: statement construction happens once
+# at import and execution hits the compiled-statement cache; defer keeps
+# legacy file_data blobs out of the lookup
+_SELECT_FILE_BY_HASH = (select(FileStorage)
+                        .options(defer(FileStorage.file_data))
+                        .where(FileStorage.file_hash == bindparam('h'))
+                        .limit(1))
+_SELECT_COMMITTED_FILE = (select(FileStorage)
+                          .options(defer(FileStorage.file_data))
+                          .where(FileStorage.file_hash == bindparam('h'),
+                                 FileStorage.status == 'committed')
+                          .limit(1))
+_SELECT_LATEST_QUOTE = (select(TPMQuote)
+                        .where(TPMQuote.node_id == bindparam('n'))
+                        .order_by(TPMQuote.id.desc())
+                        .limit(1))
+
+# The commit broadcast always has the same five fields and the digest is
+# hex (never needs escaping), so a %-template skips the JSON encoder on
+# the most frequent message in the system
+_COMMIT_TMPL = (b'{"type":"blockchain_commit","digest":"%b",'
+                b'"node_id":%d,"files_committed":%d,"timestamp":%d}')
 
 
 # FIXED: Modern FastAPI lifespan event handler
@@ -56,7 +123,7 @@ blockchain_files: Dict[str, dict] = {}
 async def lifespan(app: FastAPI):
     """Modern FastAPI lifespan event handler"""
     # Startup
-    global tmp_manager, pbft_node
+    global tmp_manager, pbft_node, scheduler, commit_writer_task
     logger.info(f"🚀 Starting SFIM Node {NODE_ID}")
     logger.info(f"📡 Peers: {PEERS}")
 
@@ -97,6 +164,17 @@ async def lifespan(app: FastAPI):
             except Exception as e:
                 logger.error(f"❌ TPM initialization failed: {e}")
 
+        # Seed the in-memory committed-hash mirror (one query per process).
+        # This must complete before the commit writer or PBFT start, or an
+        # early commit would push hashes the seed then loads again
+        committed = await asyncio.to_thread(_committed_file_hashes_sync)
+        for h in committed:
+            committed_frontier.push(bytes.fromhex(h))
+        logger.info(f"📊 Loaded {committed_frontier.leaf_count} committed file hashes")
+
+        # Start the commit writer before PBFT traffic can produce commits
+        commit_writer_task = asyncio.create_task(_commit_writer())
+
         # Start PBFT node
         if pbft_node:
             try:
@@ -111,8 +189,9 @@ async def lifespan(app: FastAPI):
 
         # Start background tasks
         logger.info("🔄 Starting background tasks...")
-        asyncio.create_task(periodic_attestation())
-        asyncio.create_task(cleanup_old_data())
+        scheduler = PeriodicScheduler()
+        scheduler.add_job('attestation', 60, periodic_attestation)
+        scheduler.add_job('cleanup', 3600, cleanup_old_data)
 
         logger.info(f"🎉 SFIM Node {NODE_ID} started successfully!")
 
@@ -124,6 +203,10 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info("🔄 Shutting down SFIM Node...")
+    if scheduler:
+        await scheduler.shutdown()
+    if commit_writer_task:
+        commit_writer_task.cancel()
     if pbft_node:
         await pbft_node.stop()
     logger.info("✅ SFIM Node shutdown complete")
@@ -145,133 +228,200 @@ app.add_middleware(
 )
 
 
-async def handle_consensus_commit(digest: str, commit_messages: List[dict]):
-    """Handle when PBFT consensus is reached - ADD TO BLOCKCHAIN"""
-    db = None
-    try:
-        logger.info(f"✅ BLOCKCHAIN COMMIT: {digest[:16]}...")
-        db = create_db_session()  # FIXED: Use new database manager
-
-        # Update file storage status to 'committed'
-        file_records = db.query(FileStorage).filter(FileStorage.merkle_root == digest).all()
-        for file_record in file_records:
-            file_record.status = 'committed'
-            file_record.consensus_round = pbft_node.sequence_number
-
-            # Add to blockchain registry
-            blockchain_files[file_record.file_hash] = {
-                'file_hash': file_record.file_hash,
-                'merkle_root': digest,
-                'consensus_round': pbft_node.sequence_number,
-                'node_id': NODE_ID,
-                'status': 'committed',
-                'timestamp': time.time()
-            }
+def _apply_commit_batch_sync(batch: List[tuple]) -> List[List[str]]:
+    """Apply a batch of consensus commits in one transaction.
+
+    Runs in a worker thread so the event loop never blocks on SQLite
+    I/O. Batching means a burst of digests pays one commit fsync instead
+    of one per digest. Returns the file hashes committed per digest; the
+    in-memory mirrors are updated by the caller on the event loop once
+    the transaction has actually committed.
+    """
+    hash_lists = []
+    with session_scope() as db:
+        for digest, commit_messages in batch:
+            hash_lists.append(_apply_one_commit(db, digest, commit_messages))
+    return hash_lists
+
+
+def _apply_one_commit(db, digest: str, commit_messages: List[dict]) -> List[str]:
+    """Flip one digest's rows to committed inside an open session"""
+    consensus_round = pbft_node.sequence_number
+    # Fetch only the hashes (the caller feeds them to the in-memory
+    # mirrors), then flip both tables with one set-based UPDATE each
+    # instead of loading full rows and letting the ORM emit one UPDATE
+    # per row
+    # Guard on status: a digest can recommit once it ages out of the
+    # bounded committed-digests history, and re-pushing already-committed
+    # hashes would corrupt the in-memory frontier every later root
+    # derives from
+    file_hashes = [row[0] for row in
+                   db.query(FileStorage.file_hash)
+                     .filter(FileStorage.merkle_root == digest,
+                             FileStorage.status != 'committed').all()]
+
+    db.query(FileStorage).filter(FileStorage.merkle_root == digest,
+                                 FileStorage.status != 'committed').update(
+        {FileStorage.status: 'committed',
+         FileStorage.consensus_round: consensus_round},
+        synchronize_session=False)
+
+    # Update integrity events; the aggregate was folded vote-by-vote
+    # as COMMITs arrived, so this is a dict pop, not EC arithmetic
+    aggregated_sig = (pbft_node.pop_aggregate(digest) or
+                      pbft_node.bls.aggregate(
+                          [msg['signature'] for msg in commit_messages]))
+    db.query(IntegrityEvent).filter(IntegrityEvent.merkle_root == digest,
+                                    IntegrityEvent.status != 'committed').update(
+        {IntegrityEvent.status: 'committed',
+         IntegrityEvent.bls_signature: aggregated_sig,
+         IntegrityEvent.consensus_round: consensus_round},
+        synchronize_session=False)
+
+    # Create audit log
+    db.execute(_INSERT_AUDIT, {
+        'event_type': 'blockchain_commit',
+        'node_id': NODE_ID,
+        'message': f'File(s) added to blockchain: {digest[:16]}',
+        # JSONText encodes the dict at bind time
+        'details': {
+            'digest': digest,
+            'commit_count': len(commit_messages),
+            'consensus_round': consensus_round,
+            'files_committed': len(file_hashes)
+        }
+    })
+    return file_hashes
 
-        # Update integrity events
-        events = db.query(IntegrityEvent).filter(IntegrityEvent.merkle_root == digest).all()
-        signatures = [msg['signature'] for msg in commit_messages]
-        aggregated_sig = pbft_node.bls.aggregate(signatures)
 
-        for event in events:
-            event.status = 'committed'
-            event.bls_signature = aggregated_sig
-            event.consensus_round = pbft_node.sequence_number
+# Digests queue here and a single writer task applies them; a burst of
+# commits lands in one transaction instead of one fsync each
+commit_queue: asyncio.Queue = asyncio.Queue()
+COMMIT_BATCH = 64
 
-        # Create audit log
-        audit_log = AuditLog(
-            event_type='blockchain_commit',
-            node_id=NODE_ID,
-            message=f'File(s) added to blockchain: {digest[:16]}',
-            details=json.dumps({
-                'digest': digest,
-                'commit_count': len(commit_messages),
-                'consensus_round': pbft_node.sequence_number,
-                'files_committed': len(file_records)
-            })
-        )
-        db.add(audit_log)
-        db.commit()
 
-        # Notify pending uploads
-        for upload_id, upload_data in list(pending_uploads.items()):
-            if upload_data.get('merkle_root') == digest:
+async def _commit_writer():
+    """Drain the commit queue, batching whatever has accumulated"""
+    while True:
+        batch = [await commit_queue.get()]
+        while len(batch) < COMMIT_BATCH:
+            try:
+                batch.append(commit_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            hash_lists = await asyncio.to_thread(
+                _apply_commit_batch_sync,
+                [(digest, msgs) for digest, msgs, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            # The exception is re-raised to every waiter; keep draining
+            continue
+
+        # Mirror updates run here, on the event loop, and only after the
+        # batch transaction has committed: a concurrent trial-root copy()
+        # can never observe a half-applied push, and a rollback can never
+        # leave the frontier ahead of the database
+        consensus_round = pbft_node.sequence_number
+        for (digest, _, future), file_hashes in zip(batch, hash_lists):
+            for file_hash in file_hashes:
+                committed_frontier.push(bytes.fromhex(file_hash))
+                blockchain_files[file_hash] = {
+                    'file_hash': file_hash,
+                    'merkle_root': digest,
+                    'consensus_round': consensus_round,
+                    'node_id': NODE_ID,
+                    'status': 'committed',
+                    'timestamp': _now_ms()
+                }
+            if not future.done():
+                future.set_result(len(file_hashes))
+
+
+async def handle_consensus_commit(digest: str, commit_messages: List[dict]):
+    """Handle when PBFT consensus is reached - ADD TO BLOCKCHAIN"""
+    try:
+        logger.info(f"✅ BLOCKCHAIN COMMIT: {digest[:16]}...")
+        future = asyncio.get_running_loop().create_future()
+        await commit_queue.put((digest, commit_messages, future))
+        files_committed = await future
+
+        # Notify exactly the uploads waiting on this digest
+        async with pending_lock:
+            waiters = pending_by_root.pop(digest, ())
+            for upload_id in waiters:
+                upload_data = pending_uploads.get(upload_id)
+                if upload_data is None:
+                    continue
                 upload_data['status'] = 'committed'
                 upload_data['consensus_round'] = pbft_node.sequence_number
+                upload_data['event'].set()
 
-        # Broadcast to clients
-        await broadcast_to_clients({
-            'type': 'blockchain_commit',
-            'digest': digest,
-            'node_id': NODE_ID,
-            'files_committed': len(file_records),
-            'timestamp': int(time.time() * 1000)
-        })
+        # Fire-and-forget: the PBFT commit path shouldn't wait on WS fan-out
+        asyncio.create_task(broadcast_to_clients(
+            _COMMIT_TMPL % (digest.encode(), NODE_ID, files_committed,
+                            _now_ms())))
 
-        logger.info(f"🔗 {len(file_records)} file(s) successfully added to blockchain")
+        logger.info(f"🔗 {files_committed} file(s) successfully added to blockchain")
 
     except Exception as e:
         logger.error(f"❌ Error in blockchain commit: {e}")
-        if db:
-            db.rollback()
-    finally:
-        if db:
-            db.close()
+
+
+def _store_tmp_quote_sync(quote, trust_level: str):
+    """Insert a TPM quote row (runs in a worker thread)"""
+    with session_scope() as db:
+        pcr_data = _pack_pcrs(quote.pcr_values)
+        db.execute(_INSERT_QUOTE, {
+            'node_id': NODE_ID,
+            'pcr_values': pcr_data,
+            'nonce': quote.nonce.hex(),
+            'signature': quote.signature,
+            'is_valid': quote.is_valid,
+            'trust_level': trust_level
+        })
 
 
 async def store_tmp_quote(quote, trust_level: str):
     """Store TPM quote in database"""
-    db = None
     try:
-        db = create_db_session()  # FIXED: Use new database manager
-        pcr_data = json.dumps({k: v.hex() for k, v in quote.pcr_values.items()}).encode()
-        tmp_quote = TPMQuote(
-            node_id=NODE_ID,
-            pcr_values=pcr_data,
-            nonce=quote.nonce.hex(),
-            signature=quote.signature,
-            is_valid=quote.is_valid,
-            trust_level=trust_level
-        )
-        db.add(tmp_quote)
-        db.commit()
+        await asyncio.to_thread(_store_tmp_quote_sync, quote, trust_level)
         logger.debug("✅ TPM quote stored successfully")
+
+        # Push the update to subscribers instead of making them poll for it
+        await broadcast_to_clients({
+            'type': 'feed_update',
+            'kind': 'tpm_quote',
+            'node_id': NODE_ID,
+            'trust_level': trust_level,
+            'is_valid': quote.is_valid,
+            'timestamp': _now_ms()
+        })
     except Exception as e:
         logger.error(f"❌ Error storing TPM quote: {e}")
-        if db:
-            db.rollback()
-    finally:
-        if db:
-            db.close()
 
 
 async def register_node():
     """Register this node in the database"""
-    db = None
     try:
-        db = create_db_session()  # FIXED: Use new database manager
-        existing_node = db.query(NodeModel).filter(NodeModel.node_id == NODE_ID).first()
-        if existing_node:
-            existing_node.status = 'active'
-            existing_node.last_seen = datetime.now()
-        else:
-            # from datetime import datetime
-            node = NodeModel(
-                node_id=NODE_ID,
-                address=f"http://localhost:{PORT}",
-                status='active',
-                trust_score=100
-            )
-            db.add(node)
-        db.commit()
+        with session_scope() as db:
+            existing_node = db.query(NodeModel).filter(NodeModel.node_id == NODE_ID).first()
+            if existing_node:
+                existing_node.status = 'active'
+                existing_node.last_seen = datetime.now()
+            else:
+                node = NodeModel(
+                    node_id=NODE_ID,
+                    address=f"http://localhost:{PORT}",
+                    status='active',
+                    trust_score=100
+                )
+                db.add(node)
         logger.info("✅ Node registered successfully")
     except Exception as e:
         logger.error(f"❌ Error registering node: {e}")
-        if db:
-            db.rollback()
-    finally:
-        if db:
-            db.close()
 
 
 def validate_tmp_quote_with_peers(quote, trust_level: str) -> bool:
@@ -279,50 +429,193 @@ def validate_tmp_quote_with_peers(quote, trust_level: str) -> bool:
     return trust_level == 'trusted'
 
 
+def _committed_file_hashes_sync() -> List[str]:
+    """Fetch hex hashes of committed files (runs in a worker thread)"""
+    with session_scope() as db:
+        committed_files = db.query(FileStorage).filter(FileStorage.status == 'committed').all()
+        return [f.file_hash for f in committed_files]
+
+
+# Memo for trial roots: the same file re-uploaded (or retried) against an
+# unchanged frontier yields the same root, so skip the recompute. Keyed on
+# the frontier length because any commit invalidates every earlier trial.
+_trial_root_cache: Dict[tuple, str] = {}
+
+
 async def compute_merkle_root_for_new_file(new_file_hash: str) -> str:
     """Compute Merkle root including existing blockchain files + new file"""
-    db = None
     try:
-        db = create_db_session()  # FIXED: Use new database manager
-        committed_files = db.query(FileStorage).filter(FileStorage.status == 'committed').all()
-        file_hashes = [bytes.fromhex(f.file_hash) for f in committed_files]
-        file_hashes.append(bytes.fromhex(new_file_hash))
-
-        if file_hashes:
-            root = merkle_root(file_hashes)
-            logger.info(f"📊 Computed Merkle root for {len(file_hashes)} files")
-            return root.hex()
-        else:
-            return hashlib.sha512(bytes.fromhex(new_file_hash)).hexdigest()
+        key = (committed_frontier.leaf_count, new_file_hash)
+        cached = _trial_root_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Trial-append on a snapshot of the frontier: O(log N) hashes per
+        # upload, same root merkle_root would produce over the full set
+        trial = committed_frontier.copy()
+        trial.push(bytes.fromhex(new_file_hash))
+        logger.info(f"📊 Computed Merkle root for {trial.leaf_count} files")
+        root = trial.root().hex()
+
+        if len(_trial_root_cache) >= 256:
+            _trial_root_cache.clear()
+        _trial_root_cache[key] = root
+        return root
 
     except Exception as e:
         logger.error(f"❌ Error computing Merkle root: {e}")
-        return hashlib.sha512(bytes.fromhex(new_file_hash)).hexdigest()
-    finally:
-        if db:
-            db.close()
+        return hashlib.sha256(bytes.fromhex(new_file_hash)).hexdigest()
 
 
-async def broadcast_to_clients(message: dict):
-    """Broadcast message to connected WebSocket clients"""
-    if connected_clients:
-        message_json = json.dumps(message)
-        disconnected = []
-        for client in connected_clients:
-            try:
-                await client.send_text(message_json)
-            except Exception:
-                disconnected.append(client)
-        for client in disconnected:
-            connected_clients.remove(client)
+# Max events coalesced into one frame when a client's queue backs up
+SENDER_BATCH = 64
+
+
+async def _client_sender(websocket: WebSocket, queue: asyncio.Queue):
+    """Drain one client's outbound queue; each client sends at its own pace.
+
+    When a burst backs up behind a slow consumer, the pending payloads are
+    coalesced into a single JSON array frame, so catching up costs one
+    send instead of one frame (and one syscall) per event. The dashboard
+    treats an array frame as a batch of events.
+    """
+    try:
+        while True:
+            payload = await queue.get()
+            if not queue.empty():
+                batch = [payload]
+                while len(batch) < SENDER_BATCH:
+                    try:
+                        batch.append(queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                payload = b"[" + b",".join(batch) + b"]"
+            await websocket.send_bytes(payload)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        connected_clients.pop(websocket, None)
+
+
+async def broadcast_to_clients(message):
+    """Broadcast message to connected WebSocket clients.
+
+    Serializes once per broadcast — every queue holds a reference to the
+    same payload string, never a copy — and enqueues without awaiting any
+    socket, so commit notifications are never head-of-line blocked by a
+    slow consumer. Callers that already hold a serialized payload can pass
+    it (str or bytes) directly and skip the dumps entirely. Clients whose
+    queue is full are dropped.
+    """
+    if not connected_clients:
+        return
+    # One UTF-8 buffer shared by every queue; send_text would re-encode
+    # the string once per client inside the protocol layer
+    if isinstance(message, bytes):
+        payload = message
+    elif isinstance(message, str):
+        payload = message.encode()
+    else:
+        payload = dumps_bytes(message)
+    # Enqueueing is non-blocking, but with enough clients even that loop
+    # monopolizes the event loop; yield periodically so consensus message
+    # handling interleaves with large fan-outs
+    for i, (websocket, (queue, sender)) in enumerate(list(connected_clients.items())):
+        if i and i % 100 == 0:
+            await asyncio.sleep(0)
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning("🐌 Dropping slow WebSocket client (queue full)")
+            connected_clients.pop(websocket, None)
+            sender.cancel()
 
 
 async def handle_file_upload_event(message, websocket):
-    """Handle file upload via WebSocket - Not implemented"""
-    logger.warning("WebSocket file upload is not implemented.")
-    await websocket.send_text(json.dumps({
-        "type": "error",
-        "message": "File upload via WebSocket not supported"
+    """Handle chunked file upload via WebSocket.
+
+    The announce message carries file_name/file_size; the content follows
+    as binary frames. Frames land in a preallocated bytearray via slice
+    assignment — `bytes += chunk` would recopy the whole accumulator per
+    frame, which is quadratic over the upload.
+    """
+    file_name = message.get('file_name') or 'unknown'
+    try:
+        file_size = int(message.get('file_size', 0))
+    except (TypeError, ValueError):
+        file_size = 0
+    if not 0 < file_size <= MAX_WS_UPLOAD:
+        await websocket.send_bytes(dumps_bytes({
+            "type": "error",
+            "message": f"file_size must be between 1 and {MAX_WS_UPLOAD} bytes"
+        }))
+        return
+
+    buffer = bytearray(file_size)
+    hasher = hashlib.sha256()
+    offset = 0
+    while offset < file_size:
+        frame = await websocket.receive()
+        chunk = frame.get('bytes')
+        if chunk is None:
+            await websocket.send_bytes(dumps_bytes({
+                "type": "error",
+                "message": "Expected binary frame during file upload"
+            }))
+            return
+        end = offset + len(chunk)
+        if end > file_size:
+            await websocket.send_bytes(dumps_bytes({
+                "type": "error",
+                "message": "Received more bytes than announced file_size"
+            }))
+            return
+        buffer[offset:end] = chunk
+        offset = end
+        # Hash each frame as it lands (off the loop thread; hashlib drops
+        # the GIL for buffers this size) so the digest finishes with the
+        # transfer instead of adding a full pass over the file afterwards
+        await asyncio.to_thread(hasher.update, chunk)
+
+    file_hash = hasher.hexdigest()
+    logger.info(f"📄 WS upload received: {file_name} ({file_size} bytes), "
+                f"SHA-256: {file_hash[:16]}...")
+
+    await asyncio.to_thread(store_blob, file_hash, buffer)
+    merkle_tree_root = await compute_merkle_root_for_new_file(file_hash)
+
+    def _persist():
+        with session_scope() as db:
+            db.execute(_INSERT_FILE, {
+                'file_name': file_name,
+                'file_hash': file_hash,
+                'file_size': file_size,
+                'mime_type': message.get('mime_type'),
+                'merkle_root': merkle_tree_root,
+                'node_id': NODE_ID,
+                'consensus_round': 0,
+                'status': 'pending'
+            })
+            db.execute(_INSERT_EVENT, {
+                'merkle_root': merkle_tree_root,
+                'file_path': file_name,
+                'file_hash': file_hash,
+                'node_id': NODE_ID,
+                'consensus_round': 0,
+                'status': 'pending'
+            })
+
+    await asyncio.to_thread(_persist)
+
+    if pbft_node and pbft_node.is_primary:
+        await pbft_node.propose(merkle_tree_root)
+
+    await websocket.send_bytes(dumps_bytes({
+        "type": "file_upload_ack",
+        "file_name": file_name,
+        "file_hash": file_hash,
+        "merkle_root": merkle_tree_root,
+        "status": "pending"
     }))
 
 
@@ -330,11 +623,13 @@ async def handle_file_upload_event(message, websocket):
 async def unified_websocket_endpoint(websocket: WebSocket):
     """Unified WebSocket endpoint for all communication"""
     await websocket.accept()
-    connected_clients.append(websocket)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    sender = asyncio.create_task(_client_sender(websocket, queue))
+    connected_clients[websocket] = (queue, sender)
     try:
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message = loads(data)
             message_type = message.get('type')
 
             if message_type == 'integrity_event':
@@ -342,15 +637,23 @@ async def unified_websocket_endpoint(websocket: WebSocket):
             elif message_type == 'file_upload':
                 await handle_file_upload_event(message, websocket)
     except WebSocketDisconnect:
-        connected_clients.remove(websocket)
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
+    finally:
+        connected_clients.pop(websocket, None)
+        sender.cancel()
 
 
 async def handle_integrity_event(message: dict, websocket: WebSocket):
     """Handle integrity event from file agent"""
     merkle_root_val = message.get('merkle_root')
     if pbft_node and pbft_node.is_primary:
+        # Agents resend their current root on reconnect; a digest that
+        # already went through consensus doesn't need another round
+        if merkle_root_val in pbft_node.committed_digests:
+            logger.debug(f"⏭️ Digest already committed, skipping propose: {merkle_root_val[:16]}...")
+            return
         await pbft_node.propose(merkle_root_val)
 
 
@@ -365,16 +668,33 @@ async def upload_file_blockchain_workflow(
     try:
         logger.info(f"🚀 Starting blockchain upload workflow: {file.filename}")
 
-        # Step 1: File Scanner
-        file_content = await file.read()
-        file_hash = hashlib.sha512(file_content).hexdigest()
-        logger.info(f"📄 File scanned, SHA-512: {file_hash[:16]}...")
+        # Step 1: File Scanner — hash in 1 MiB chunks so the whole upload
+        # never has to sit in one contiguous read and hashing overlaps the
+        # socket I/O
+        hasher = hashlib.sha256()
+        chunks = []
+        while chunk := await file.read(1 << 20):
+            # hashlib releases the GIL for buffers this size, so hashing
+            # in a worker thread overlaps with the next socket read and
+            # never stalls other handlers on the loop thread
+            await asyncio.to_thread(hasher.update, chunk)
+            chunks.append(chunk)
+        file_content = b''.join(chunks)
+        del chunks
+        file_hash = hasher.hexdigest()
+        logger.info(f"📄 File scanned, SHA-256: {file_hash[:16]}...")
+
+        # Content-addressed blob store keeps the bytes out of SQLite; the
+        # row carries only the hash. fsync'd write off the event loop.
+        await asyncio.to_thread(store_blob, file_hash, file_content)
 
         # Step 2: TPM Attestation
         if not tmp_manager:
             raise HTTPException(status_code=500, detail="TPM Manager not initialized")
 
-        tmp_quote = tmp_manager.collect_quote()
+        # Quote collection hashes PCR state and signs it; keep that off
+        # the loop thread like the upload hashing above
+        tmp_quote = await asyncio.to_thread(tmp_manager.collect_quote)
         trust_level = tmp_manager.get_node_trust_level(tmp_quote)
 
         if trust_level == "untrusted":
@@ -392,51 +712,52 @@ async def upload_file_blockchain_workflow(
         merkle_tree_root = await compute_merkle_root_for_new_file(file_hash)
         logger.info(f"🌳 Merkle root computed: {merkle_tree_root[:16]}...")
 
-        # Step 5: Store file with 'pending' status
-        file_record = FileStorage(
-            file_name=file.filename or 'unknown',
-            file_hash=file_hash,
-            file_size=len(file_content),
-            mime_type=file.content_type,
-            file_data=file_content,
-            merkle_root=merkle_tree_root,
-            node_id=NODE_ID,
-            consensus_round=0,
-            status='pending'
-        )
-        db.add(file_record)
-
-        integrity_event = IntegrityEvent(
-            merkle_root=merkle_tree_root,
-            file_path=file.filename,
-            file_hash=file_hash,
-            node_id=NODE_ID,
-            consensus_round=0,
-            status='pending'
-        )
-        db.add(integrity_event)
-
-        # Store TPM Quote
-        tmp_quote_record = TPMQuote(
-            node_id=NODE_ID,
-            pcr_values=json.dumps({k: v.hex() for k, v in tmp_quote.pcr_values.items()}).encode(),
-            nonce=tmp_quote.nonce.hex(),
-            signature=tmp_quote.signature,
-            is_valid=tmp_quote.is_valid,
-            trust_level=trust_level
-        )
-        db.add(tmp_quote_record)
+        # Step 5: Store file with 'pending' status. Core inserts skip the
+        # ORM unit-of-work flush; these rows are write-only here (commits
+        # later flip them with bulk UPDATEs, never through this session)
+        db.execute(_INSERT_FILE, {
+            'file_name': file.filename or 'unknown',
+            'file_hash': file_hash,
+            'file_size': len(file_content),
+            'mime_type': file.content_type,
+            'merkle_root': merkle_tree_root,
+            'node_id': NODE_ID,
+            'consensus_round': 0,
+            'status': 'pending'
+        })
+        db.execute(_INSERT_EVENT, {
+            'merkle_root': merkle_tree_root,
+            'file_path': file.filename,
+            'file_hash': file_hash,
+            'node_id': NODE_ID,
+            'consensus_round': 0,
+            'status': 'pending'
+        })
+        db.execute(_INSERT_QUOTE, {
+            'node_id': NODE_ID,
+            'pcr_values': _pack_pcrs(tmp_quote.pcr_values),
+            'nonce': tmp_quote.nonce.hex(),
+            'signature': tmp_quote.signature,
+            'is_valid': tmp_quote.is_valid,
+            'trust_level': trust_level
+        })
         db.commit()
 
         # Step 6: Broadcasting + PBFT Consensus
         logger.info(f"📡 Broadcasting Merkle root to network...")
 
-        pending_uploads[upload_id] = {
-            'file_hash': file_hash,
-            'merkle_root': merkle_tree_root,
-            'status': 'pending',
-            'timestamp': time.time()
-        }
+        async with pending_lock:
+            pending_uploads[upload_id] = {
+                'file_hash': file_hash,
+                'merkle_root': merkle_tree_root,
+                'status': 'pending',
+                # Monotonic: only used for expiry math in cleanup_old_data
+                'timestamp': time.monotonic(),
+                # Set by handle_consensus_commit; the uploader waits on it
+                # instead of polling the status field
+                'event': asyncio.Event()
+            }
+            pending_by_root.setdefault(merkle_tree_root, set()).add(upload_id)
 
         # Initiate PBFT consensus
         if pbft_node and pbft_node.is_primary:
@@ -445,27 +766,34 @@ async def upload_file_blockchain_workflow(
         else:
             logger.info(f"⏳ Waiting for PBFT consensus from primary node")
 
-        # Step 7: Wait for consensus
-        max_wait_time = 30
-        wait_start = time.time()
-
-        while time.time() - wait_start < max_wait_time:
-            upload_status = pending_uploads.get(upload_id, {})
-            if upload_status.get('status') == 'committed':
-                logger.info(f"🔗 File successfully added to blockchain!")
-
-                return {
-                    "success": True,
-                    "message": "File successfully added to blockchain",
-                    "file_hash": file_hash,
-                    "merkle_root": merkle_tree_root,
-                    "trust_level": trust_level,
-                    "consensus_status": "committed",
-                    "consensus_round": upload_status.get('consensus_round'),
-                    "blockchain_status": "✅ ON BLOCKCHAIN"
-                }
-
-            await asyncio.sleep(1)
+        # Step 7: Wait for consensus (woken by handle_consensus_commit)
+        try:
+            await asyncio.wait_for(pending_uploads[upload_id]['event'].wait(),
+                                   timeout=30)
+        except asyncio.TimeoutError:
+            pass
+
+        async with pending_lock:
+            upload_status = pending_uploads.pop(upload_id, {})
+            waiters = pending_by_root.get(merkle_tree_root)
+            if waiters is not None:
+                waiters.discard(upload_id)
+                if not waiters:
+                    del pending_by_root[merkle_tree_root]
+
+        if upload_status.get('status') == 'committed':
+            logger.info(f"🔗 File successfully added to blockchain!")
+
+            return {
+                "success": True,
+                "message": "File successfully added to blockchain",
+                "file_hash": file_hash,
+                "merkle_root": merkle_tree_root,
+                "trust_level": trust_level,
+                "consensus_status": "committed",
+                "consensus_round": upload_status.get('consensus_round'),
+                "blockchain_status": "✅ ON BLOCKCHAIN"
+            }
 
         # Timeout
         logger.warning(f"⏰ Consensus timeout for upload: {file.filename}")
@@ -482,8 +810,14 @@ async def upload_file_blockchain_workflow(
     except Exception as e:
         logger.error(f"❌ Blockchain upload failed: {e}")
         db.rollback()
-        if upload_id in pending_uploads:
-            del pending_uploads[upload_id]
+        async with pending_lock:
+            upload_data = pending_uploads.pop(upload_id, None)
+            if upload_data is not None:
+                waiters = pending_by_root.get(upload_data['merkle_root'])
+                if waiters is not None:
+                    waiters.discard(upload_id)
+                    if not waiters:
+                        del pending_by_root[upload_data['merkle_root']]
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -494,22 +828,21 @@ async def verify_file_blockchain_integrity(file: UploadFile = File(...), db: Ses
         logger.info(f"🔍 Verifying blockchain integrity for: {file.filename}")
 
         file_content = await file.read()
-        file_hash = hashlib.sha512(file_content).hexdigest()
+        # Hash off the event loop; see /api/upload
+        file_hash = await asyncio.to_thread(
+            lambda: hashlib.sha256(file_content).hexdigest())
         logger.info(f"📄 File hash: {file_hash[:16]}...")
 
         # Check blockchain registry
         if file_hash in blockchain_files:
             logger.info(f"✅ File found on blockchain!")
 
-            db_record = db.query(FileStorage).filter(
-                FileStorage.file_hash == file_hash,
-                FileStorage.status == 'committed'
-            ).first()
+            db_record = db.execute(
+                _SELECT_COMMITTED_FILE, {'h': file_hash}).scalars().first()
 
             if db_record:
-                latest_quote = db.query(TPMQuote).filter(
-                    TPMQuote.node_id == db_record.node_id
-                ).order_by(TPMQuote.id.desc()).first()
+                latest_quote = db.execute(
+                    _SELECT_LATEST_QUOTE, {'n': db_record.node_id}).scalars().first()
 
                 return {
                     "valid": True,
@@ -536,7 +869,8 @@ async def verify_file_blockchain_integrity(file: UploadFile = File(...), db: Ses
                 }
         else:
             # Check if pending
-            file_record = db.query(FileStorage).filter(FileStorage.file_hash == file_hash).first()
+            file_record = db.execute(
+                _SELECT_FILE_BY_HASH, {'h': file_hash}).scalars().first()
             if file_record and file_record.status == 'pending':
                 return {
                     "valid": False,
@@ -565,56 +899,217 @@ async def get_blockchain_status():
         'blockchain_files': len(blockchain_files),
         'pending_uploads': len(pending_uploads),
         'consensus_round': pbft_node.sequence_number if pbft_node else 0,
-        'timestamp': int(time.time() * 1000)
+        'timestamp': _now_ms()
     }
 
 
 @app.get("/api/files")
-async def get_files(limit: int = 50, db: Session = Depends(get_db_session)):
-    files = db.query(FileStorage).order_by(FileStorage.id.desc()).limit(limit).all()
-    return [file_record.to_dict() for file_record in files]
+async def get_files(limit: int = 50, before_id: int = 0,
+                    db: Session = Depends(get_db_read_session)):
+    """List files; before_id pages backwards by keyset, not OFFSET"""
+    # defer keeps legacy file_data blobs out of the listing query
+    query = db.query(FileStorage).options(defer(FileStorage.file_data))
+    if before_id:
+        query = query.filter(FileStorage.id < before_id)
+    files = query.order_by(FileStorage.id.desc()).limit(limit).all()
+    # Pre-encode with jsonutil; FastAPI's jsonable_encoder would walk the
+    # dicts a second time before serializing
+    return Response(content=dumps_bytes([f.to_dict() for f in files]),
+                    media_type="application/json")
+
+
+@app.get("/api/files/{file_hash}/content")
+async def get_file_content(file_hash: str, db: Session = Depends(get_db_read_session)):
+    """Stream a stored file back from the blob store"""
+    record = (db.query(FileStorage)
+                .options(defer(FileStorage.file_data))
+                .filter(FileStorage.file_hash == file_hash).first())
+    if record is None:
+        raise HTTPException(status_code=404, detail="Unknown file hash")
+
+    path = blob_path(file_hash)
+    if os.path.exists(path):
+        return FileResponse(path,
+                            media_type=record.mime_type or 'application/octet-stream',
+                            filename=record.file_name)
+
+    # Rows written before the blob-store split keep their bytes in the
+    # legacy file_data column; deferred above, so the blob is only
+    # loaded when this fallback actually runs
+    if record.file_data is not None:
+        return Response(
+            content=record.file_data,
+            media_type=record.mime_type or 'application/octet-stream',
+            headers={'Content-Disposition':
+                     f'attachment; filename="{record.file_name}"'})
+
+    raise HTTPException(status_code=404, detail="File content not available on this node")
+
+
+# Column tuple for the events snapshot; selecting columns skips ORM object
+# construction and identity-map bookkeeping entirely
+_EVENT_COLUMNS = (
+    IntegrityEvent.id, IntegrityEvent.merkle_root, IntegrityEvent.file_path,
+    IntegrityEvent.file_hash, IntegrityEvent.bls_signature, IntegrityEvent.node_id,
+    IntegrityEvent.consensus_round, IntegrityEvent.status,
+    IntegrityEvent.timestamp, IntegrityEvent.created_at,
+)
 
 
 @app.get("/api/events")
-async def get_events(limit: int = 50, db: Session = Depends(get_db_session)):
-    events = db.query(IntegrityEvent).order_by(IntegrityEvent.id.desc()).limit(limit).all()
-    return [event.to_dict() for event in events]
+async def get_events(limit: int = 50, since_id: int = 0, before_id: int = 0,
+                     db: Session = Depends(get_db_read_session)):
+    """List recent events; since_id fetches only the delta and before_id
+    pages backwards by keyset"""
+    query = db.query(*_EVENT_COLUMNS)
+    if since_id:
+        query = query.filter(IntegrityEvent.id > since_id)
+    if before_id:
+        query = query.filter(IntegrityEvent.id < before_id)
+    rows = query.order_by(IntegrityEvent.id.desc()).limit(limit).all()
+    payload = [{
+        'id': r[0],
+        'merkle_root': r[1],
+        'file_path': r[2],
+        'file_hash': r[3],
+        'bls_signature': r[4],
+        'node_id': r[5],
+        'consensus_round': r[6],
+        'status': r[7],
+        'timestamp': r[8].isoformat() if r[8] else None,
+        'created_at': r[9].isoformat() if r[9] else None,
+    } for r in rows]
+    # Serialize here instead of letting FastAPI re-validate and re-encode
+    return Response(content=dumps_bytes(payload), media_type="application/json")
 
 
 # Background tasks
+class PeriodicScheduler:
+    """Runs the periodic background jobs with serialized DB access.
+
+    Intervals use monotonic deadlines (immune to NTP clock steps) with
+    ±10% jitter so a fleet of nodes started together does not fire its
+    attestation and cleanup writes in lockstep.
+
+    Each job keeps its own interval, but all jobs share one lock so the
+    hourly cleanup can never grab the SQLite write lock while the
+    attestation write (or a consensus commit routed through the same
+    writer pool) is mid-transaction. Task handles are kept so shutdown
+    cancels the loops instead of orphaning them.
+    """
+
+    def __init__(self):
+        self._db_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, interval: float, func):
+        """Schedule `func` to run every `interval` seconds"""
+        task = asyncio.create_task(self._run(name, interval, func), name=name)
+        self._tasks.append(task)
+
+    async def _run(self, name: str, interval: float, func):
+        next_run = time.monotonic() + interval * random.uniform(0.9, 1.1)
+        while True:
+            await asyncio.sleep(max(next_run - time.monotonic(), 0))
+            next_run = time.monotonic() + interval * random.uniform(0.9, 1.1)
+            try:
+                async with self._db_lock:
+                    await func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Background job '{name}' error: {e}")
+
+    async def shutdown(self):
+        """Cancel all jobs and wait for them to finish"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
 async def periodic_attestation():
     """Periodic TPM attestation"""
-    while True:
-        try:
-            await asyncio.sleep(60)
-            if tmp_manager:
-                quote = tmp_manager.collect_quote()
-                trust_level = tmp_manager.get_node_trust_level(quote)
-                await store_tmp_quote(quote, trust_level)
-                if trust_level == "untrusted":
-                    logger.error("❌ Periodic TPM attestation failed!")
-        except Exception as e:
-            logger.error(f"❌ Periodic attestation error: {e}")
+    if tmp_manager:
+        quote = await asyncio.to_thread(tmp_manager.collect_quote)
+        trust_level = tmp_manager.get_node_trust_level(quote)
+        await store_tmp_quote(quote, trust_level)
+        if trust_level == "untrusted":
+            logger.error("❌ Periodic TPM attestation failed!")
 
 
 async def cleanup_old_data():
-    """Clean up old data periodically"""
-    while True:
-        try:
-            await asyncio.sleep(3600)
-            current_time = time.time()
-            expired_uploads = [
-                upload_id for upload_id, data in pending_uploads.items()
-                if current_time - data.get('timestamp', 0) > 1800
-            ]
-            for upload_id in expired_uploads:
-                del pending_uploads[upload_id]
-
-            if expired_uploads:
-                logger.info(f"🧹 Cleaned up {len(expired_uploads)} expired pending uploads")
-        except Exception as e:
-            logger.error(f"❌ Cleanup error: {e}")
+    """Clean up old data"""
+    current_time = time.monotonic()
+    async with pending_lock:
+        expired_uploads = [
+            upload_id for upload_id, data in pending_uploads.items()
+            if current_time - data.get('timestamp', 0) > 1800
+        ]
+        for upload_id in expired_uploads:
+            data = pending_uploads.pop(upload_id)
+            waiters = pending_by_root.get(data['merkle_root'])
+            if waiters is not None:
+                waiters.discard(upload_id)
+                if not waiters:
+                    del pending_by_root[data['merkle_root']]
+
+    if expired_uploads:
+        logger.info(f"🧹 Cleaned up {len(expired_uploads)} expired pending uploads")
+
+    # Retention for append-only tables: one bulk DELETE each instead of
+    # fetching rows as ORM objects and deleting one statement at a time
+    def _prune_sync():
+        with session_scope() as db:
+            cutoff = datetime.utcnow() - timedelta(hours=RETENTION_HOURS)
+            deleted_logs = db.query(AuditLog).filter(
+                AuditLog.timestamp < cutoff
+            ).delete(synchronize_session=False)
+            deleted_quotes = db.query(TPMQuote).filter(
+                TPMQuote.created_at < cutoff
+            ).delete(synchronize_session=False)
+            # Uploads that never reached consensus leave pending rows
+            # behind; prune them on the same retention horizon (the
+            # partial pending indexes keep these filters off the
+            # committed bulk of both tables)
+            deleted_files = db.query(FileStorage).filter(
+                FileStorage.status == 'pending',
+                FileStorage.created_at < cutoff
+            ).delete(synchronize_session=False)
+            deleted_events = db.query(IntegrityEvent).filter(
+                IntegrityEvent.status == 'pending',
+                IntegrityEvent.created_at < cutoff
+            ).delete(synchronize_session=False)
+            return deleted_logs, deleted_quotes, deleted_files, deleted_events
+
+    try:
+        deleted = await asyncio.to_thread(_prune_sync)
+        if any(deleted):
+            deleted_logs, deleted_quotes, deleted_files, deleted_events = deleted
+            logger.info(
+                f"🧹 Pruned {deleted_logs} audit log(s), {deleted_quotes} TPM quote(s), "
+                f"{deleted_files} stale pending file(s), {deleted_events} stale pending event(s)")
+    except Exception as e:
+        logger.error(f"❌ Retention cleanup error: {e}")
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=PORT, log_level="info")
\ No newline at end of file
+    try:
+        import uvloop  # noqa: F401  (uvicorn installs the policy itself)
+
+        loop_impl = "uvloop"
+    except ImportError:
+        loop_impl = "auto"
+    try:
+        import httptools  # noqa: F401
+
+        http_impl = "httptools"
+    except ImportError:
+        http_impl = "auto"
+    # Broadcast frames are ~100-byte JSON messages; permessage-deflate
+    # costs CPU on both ends for near-zero compression at that size.
+    # workers stays 1: the PBFT node, the Merkle frontier and the client
+    # registry are in-process singletons and cannot be sharded.
+    uvicorn.run(app, host="0.0.0.0", port=PORT, log_level="info",
+                loop=loop_impl, http=http_impl, ws="websockets",
+                ws_per_message_deflate=False)
\ No newline at end of file
@@ -72,14 +72,23 @@ export class BlockchainClient {
 
   onMessage(callback: (event: BlockchainEvent) => void) {
     if (this.ws) {
+      this.ws.binaryType = 'arraybuffer';
       this.ws.onmessage = (event) => {
         try {
-          const data = JSON.parse(event.data);
-          callback({
-            type: data.type || 'unknown',
-            data: data,
-            timestamp: Date.now(),
-          });
+          // The node broadcasts binary frames (one shared UTF-8 buffer)
+          const raw = typeof event.data === 'string'
+            ? event.data
+            : new TextDecoder().decode(event.data);
+          const data = JSON.parse(raw);
+          // The node coalesces bursts into a single array frame
+          const events = Array.isArray(data) ? data : [data];
+          for (const item of events) {
+            callback({
+              type: item.type || 'unknown',
+              data: item,
+              timestamp: Date.now(),
+            });
+          }
         } catch (error) {
           console.error('Error parsing blockchain message:', error);
         }